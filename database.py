@@ -5,7 +5,10 @@ MongoDB helper functions ready to use in your backend code.
 Import and use these functions in your API endpoints for database operations.
 """
 
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+import logging
 from datetime import datetime, timezone
 import os
 from dotenv import load_dotenv
@@ -22,15 +25,62 @@ database_url = os.getenv("DATABASE_URL")
 database_name = os.getenv("DATABASE_NAME")
 
 if database_url and database_name:
-    _client = MongoClient(database_url)
+    # Explicit pool bounds so bursts reuse warm sockets instead of opening new ones.
+    # The sizes are totals for the whole app, split evenly across uvicorn workers.
+    _workers = max(1, int(os.getenv("WEB_CONCURRENCY", 1)))
+    _client = AsyncIOMotorClient(
+        database_url,
+        maxPoolSize=max(1, int(os.getenv("DATABASE_MAX_POOL_SIZE", 50)) // _workers),
+        minPoolSize=int(os.getenv("DATABASE_MIN_POOL_SIZE", 10)) // _workers,
+        waitQueueTimeoutMS=2000,
+        serverSelectionTimeoutMS=3000,
+        retryWrites=True,
+        retryReads=True,
+    )
     db = _client[database_name]
 
-# Helper functions for common database operations
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamp"""
-    if db is None:
-        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+logger = logging.getLogger(__name__)
+
+# Optional Redis cache; use cache_get/cache_set so an unset or failing Redis behaves like a miss
+cache = None
+
+redis_url = os.getenv("REDIS_URL")
 
+if redis_url:
+    # Short timeouts so a hung Redis degrades to MongoDB instead of stalling requests
+    cache = Redis.from_url(redis_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+
+async def cache_get(key: str):
+    """Return the cached value, or None when Redis is not configured or unavailable"""
+    if cache is None:
+        return None
+    try:
+        return await cache.get(key)
+    except RedisError as e:
+        logger.warning("Redis get failed for %s: %s", key, e)
+        return None
+
+async def cache_set(key: str, ttl: int, value):
+    """Store a value with a TTL; failures are logged and ignored"""
+    if cache is None:
+        return
+    try:
+        await cache.setex(key, ttl, value)
+    except RedisError as e:
+        logger.warning("Redis setex failed for %s: %s", key, e)
+
+async def cache_incr(key: str):
+    """Increment a counter; failures are logged and ignored"""
+    if cache is None:
+        return
+    try:
+        await cache.incr(key)
+    except RedisError as e:
+        logger.warning("Redis incr failed for %s: %s", key, e)
+
+# Helper functions for common database operations
+def _prepare_document(data: Union[BaseModel, dict]) -> dict:
+    """Convert to a plain dict and stamp created_at/updated_at"""
     # Convert Pydantic model to dict if needed
     if isinstance(data, BaseModel):
         data_dict = data.model_dump()
@@ -39,17 +89,42 @@ def create_document(collection_name: str, data: Union[BaseModel, dict]):
 
     data_dict['created_at'] = datetime.now(timezone.utc)
     data_dict['updated_at'] = datetime.now(timezone.utc)
+    return data_dict
 
-    result = db[collection_name].insert_one(data_dict)
+async def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamp"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    data_dict = _prepare_document(data)
+
+    result = await db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
-def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
-    """Get documents from collection"""
+async def insert_document_if_missing(collection_name: str, filter_dict: dict, data: Union[BaseModel, dict]):
+    """Insert a document with timestamps unless one matches filter_dict, in a single atomic upsert"""
+    if db is None:
+        raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
+
+    data_dict = _prepare_document(data)
+
+    result = await db[collection_name].update_one(filter_dict, {"$setOnInsert": data_dict}, upsert=True)
+    return str(result.upserted_id) if result.upserted_id is not None else None
+
+async def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None, projection: dict = None):
+    """Get documents from collection, optionally reshaped server-side by an aggregation $project stage"""
     if db is None:
         raise Exception("Database not available. Check DATABASE_URL and DATABASE_NAME environment variables.")
     
+    if projection:
+        pipeline = [{"$match": filter_dict or {}}]
+        if limit:
+            pipeline.append({"$limit": limit})
+        pipeline.append({"$project": projection})
+        return await db[collection_name].aggregate(pipeline).to_list(length=None)
+
     cursor = db[collection_name].find(filter_dict or {})
     if limit:
         cursor = cursor.limit(limit)
     
-    return list(cursor)
+    return await cursor.to_list(length=limit)
@@ -1,36 +1,106 @@
 import os
-from fastapi import FastAPI, HTTPException
+import time
+import logging
+from fastapi import FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from starlette.concurrency import run_in_threadpool
+import anyio.to_thread
+from fastapi.responses import ORJSONResponse, Response
 from pydantic import BaseModel, EmailStr
-from typing import List, Optional
-from datetime import date
+from typing import Optional
 from io import BytesIO
+import orjson
+import numpy as np
+from bson import ObjectId
+from pymongo.errors import ConnectionFailure, PyMongoError
 
-from database import db, create_document, get_documents
-from schemas import User, Announcement, Contract, ScheduleEntry, SalaryCalc, LeaveCalc, BalanceCalc
+from database import db, cache_get, cache_set, cache_incr, create_document, get_documents, insert_document_if_missing
+from schemas import SCHEMA_CONFIG, Role, Announcement, Contract, ScheduleEntry, SalaryCalc, SalaryCalcBatch, LeaveCalc, BalanceCalc
 
 # PDF
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
 
-app = FastAPI(title="Assmat Pro API", version="0.2.0")
+logger = logging.getLogger(__name__)
 
+def _json_default(obj):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    raise TypeError
+
+def dumps(content) -> bytes:
+    """Serialize to JSON with orjson, encoding MongoDB ObjectIds as strings"""
+    return orjson.dumps(content, default=_json_default)
+
+class MongoJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also understands ObjectId; return it directly to skip jsonable_encoder"""
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def list_projection(model) -> dict:
+    """$project stage returning the schema fields plus timestamps, with _id already stringified by MongoDB"""
+    fields = {name: 1 for name in model.model_fields}
+    return {"_id": {"$toString": "$_id"}, **fields, "created_at": 1, "updated_at": 1}
+
+ANNOUNCEMENT_PROJECTION = list_projection(Announcement)
+CONTRACT_PROJECTION = list_projection(Contract)
+SCHEDULE_PROJECTION = list_projection(ScheduleEntry)
+
+app = FastAPI(title="Assmat Pro API", version="0.2.0", default_response_class=MongoJSONResponse)
+
+# Credentialed CORS needs explicit origins; browsers reject "*" together with credentials
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origin_regex=os.getenv("CORS_ORIGIN_REGEX", r"^https://(app|www)\.assmatpro\.fr$"),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,
 )
 
+# Compress larger JSON listings; small responses are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+@app.on_event("startup")
+async def size_threadpool():
+    # CPU-bound work (PDF rendering) runs in the anyio threadpool; scale it with the host
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = int(os.getenv("THREADPOOL_SIZE", (os.cpu_count() or 1) * 4))
+
+@app.on_event("startup")
+async def ensure_indexes():
+    # Back the listing filters with indexes; the unique email index guards user creation
+    # Failures are logged, not raised, so the app still boots and /test can report the problem
+    if db is None:
+        return
+    indexes = [
+        ("announcement", [("city", 1), ("author_role", 1)], {}),
+        ("contract", "parent_email", {}),
+        ("contract", "assistant_email", {}),
+        ("scheduleentry", "user_email", {}),
+        ("user", "email", {"unique": True}),
+    ]
+    for collection_name, keys, options in indexes:
+        try:
+            await db[collection_name].create_index(keys, **options)
+        except ConnectionFailure as e:
+            logger.warning("Skipping index creation, database unreachable: %s", str(e)[:80])
+            return
+        except PyMongoError as e:
+            logger.warning("Could not create index %s on %s: %s", keys, collection_name, str(e)[:80])
+
+# Health checks are hit constantly: / is pre-serialized, /test is cached for a few seconds
+ROOT_BODY = dumps({"name": "Assmat Pro API", "status": "ok"})
+TEST_CACHE_TTL = 5
+_test_cache = {"body": None, "expires": 0.0}
+
 @app.get("/")
-def read_root():
-    return {"name": "Assmat Pro API", "status": "ok"}
+async def read_root():
+    return Response(content=ROOT_BODY, media_type="application/json")
 
-@app.get("/test")
-def test_database():
+async def check_database() -> dict:
     response = {
         "backend": "✅ Running",
         "database": "❌ Not Available",
@@ -45,7 +115,7 @@ def test_database():
             response["database_url"] = "✅ Set" if os.getenv("DATABASE_URL") else "❌ Not Set"
             response["database_name"] = "✅ Set" if os.getenv("DATABASE_NAME") else "❌ Not Set"
             try:
-                collections = db.list_collection_names()
+                collections = await db.list_collection_names()
                 response["collections"] = collections[:10]
                 response["database"] = "✅ Connected & Working"
                 response["connection_status"] = "Connected"
@@ -57,17 +127,30 @@ def test_database():
         response["database"] = f"❌ Error: {str(e)[:80]}"
     return response
 
+@app.get("/test")
+async def test_database():
+    now = time.monotonic()
+    if _test_cache["body"] is None or now >= _test_cache["expires"]:
+        _test_cache["body"] = dumps(await check_database())
+        _test_cache["expires"] = now + TEST_CACHE_TTL
+    return Response(content=_test_cache["body"], media_type="application/json")
+
 # Simple auth placeholder endpoints (social login handled on frontend then verified here)
 class AuthCallback(BaseModel):
+    model_config = SCHEMA_CONFIG
+
     provider: str
     email: EmailStr
     name: Optional[str] = None
     avatar_url: Optional[str] = None
     role: Optional[str] = None
 
+# Known users are remembered for this many seconds to skip the MongoDB lookup
+USER_CACHE_TTL = 600
+
 @app.post("/auth/callback")
-def auth_callback(payload: AuthCallback):
-    # In real app: verify id_token from provider. Here we store/create user if not exists.
+async def auth_callback(payload: AuthCallback):
+    # In real app: verify id_token from provider. Here we create the user if not exists.
     user = {
         "name": payload.name or "Utilisateur",
         "email": payload.email,
@@ -76,134 +159,177 @@ def auth_callback(payload: AuthCallback):
         "provider": payload.provider,
         "is_active": True,
     }
+    cache_key = f"user:{payload.email}"
     try:
-        existing = db["user"].find_one({"email": payload.email}) if db else None
-        if not existing:
-            create_document("user", user)
+        if await cache_get(cache_key):
+            return {"ok": True, "email": payload.email}
+        await insert_document_if_missing("user", {"email": payload.email}, user)
+        await cache_set(cache_key, USER_CACHE_TTL, "1")
         return {"ok": True, "email": payload.email}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Announcements
+# Listing results are cached briefly per (city, role, limit). Keys embed a generation counter that
+# every new announcement bumps, so stale entries are never read again and simply expire.
+ANNOUNCEMENT_CACHE_TTL = 45
+ANNOUNCEMENT_GENERATION_KEY = "ann:gen"
+
 @app.post("/announcements")
-def create_announcement(data: Announcement):
+async def create_announcement(data: Announcement):
     try:
-        _id = create_document("announcement", data)
+        _id = await create_document("announcement", data)
+        await cache_incr(ANNOUNCEMENT_GENERATION_KEY)
         return {"id": _id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/announcements")
-def list_announcements(city: Optional[str] = None, role: Optional[str] = None, limit: int = 50):
+async def list_announcements(
+    city: Optional[str] = Query(None, max_length=80),
+    role: Optional[Role] = None,
+    limit: int = Query(50, ge=1, le=200),
+):
     query = {}
     if city:
         query["city"] = city
     if role:
         query["author_role"] = role
     try:
-        items = get_documents("announcement", query, limit)
-        for it in items:
-            it["_id"] = str(it.get("_id"))
-        return items
+        generation = (await cache_get(ANNOUNCEMENT_GENERATION_KEY) or b"0").decode()
+        cache_key = f"ann:{generation}:{city or ''}:{role or ''}:{limit}"
+        cached = await cache_get(cache_key)
+        if cached:
+            return Response(content=cached, media_type="application/json")
+        items = await get_documents("announcement", query, limit, ANNOUNCEMENT_PROJECTION)
+        body = dumps(items)
+        await cache_set(cache_key, ANNOUNCEMENT_CACHE_TTL, body)
+        return Response(content=body, media_type="application/json")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Contracts
 @app.post("/contracts")
-def create_contract(data: Contract):
+async def create_contract(data: Contract):
     try:
-        _id = create_document("contract", data)
+        _id = await create_document("contract", data)
         return {"id": _id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/contracts")
-def list_contracts(email: EmailStr, role: str):
+async def list_contracts(email: EmailStr, role: str):
     field = "parent_email" if role == "parent" else "assistant_email"
     try:
-        items = get_documents("contract", {field: str(email)}, 100)
-        for it in items:
-            it["_id"] = str(it.get("_id"))
-        return items
+        items = await get_documents("contract", {field: email}, 100, CONTRACT_PROJECTION)
+        return MongoJSONResponse(items)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Contract PDF generation
+PDF_MARGIN_X = 2*cm
+PDF_TOP_Y = A4[1] - 2*cm
+
+def render_contract_pdf(data: Contract) -> bytes:
+    """Draw the contract on a single A4 page"""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    x, y = PDF_MARGIN_X, PDF_TOP_Y
+
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(x, y, "Contrat de travail - Assistante Maternelle")
+    y -= 1.2*cm
+
+    c.setFont("Helvetica", 11)
+    lines = [
+        f"Parent employeur: {data.parent_email}",
+        f"Assistante maternelle: {data.assistant_email}",
+        f"Enfant: {data.child_name}",
+        f"Date de début: {data.start_date.strftime('%d/%m/%Y')}",
+        f"Heures hebdomadaires: {data.hours_per_week}",
+        f"Taux horaire: {data.hourly_rate} €",
+        f"Jours de congés payés: {data.paid_vacation_days}",
+        f"Notes: {data.notes or '-'}",
+    ]
+    for ln in lines:
+        c.drawString(x, y, ln)
+        y -= 0.8*cm
+
+    c.setFont("Helvetica-Oblique", 9)
+    c.drawString(x, 2*cm, "Assmat Pro — Généré automatiquement")
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
 @app.post("/contracts/pdf")
-def contract_pdf(data: Contract):
+async def contract_pdf(data: Contract):
     try:
-        buffer = BytesIO()
-        c = canvas.Canvas(buffer, pagesize=A4)
-        width, height = A4
-        x, y = 2*cm, height - 2*cm
-
-        c.setFont("Helvetica-Bold", 16)
-        c.drawString(x, y, "Contrat de travail - Assistante Maternelle")
-        y -= 1.2*cm
-
-        c.setFont("Helvetica", 11)
-        lines = [
-            f"Parent employeur: {data.parent_email}",
-            f"Assistante maternelle: {data.assistant_email}",
-            f"Enfant: {data.child_name}",
-            f"Date de début: {data.start_date.strftime('%d/%m/%Y')}",
-            f"Heures hebdomadaires: {data.hours_per_week}",
-            f"Taux horaire: {data.hourly_rate} €",
-            f"Jours de congés payés: {data.paid_vacation_days}",
-            f"Notes: {data.notes or '-'}",
-        ]
-        for ln in lines:
-            c.drawString(x, y, ln)
-            y -= 0.8*cm
-
-        c.setFont("Helvetica-Oblique", 9)
-        c.drawString(x, 2*cm, "Assmat Pro — Généré automatiquement")
-        c.showPage()
-        c.save()
-        buffer.seek(0)
+        pdf_bytes = await run_in_threadpool(render_contract_pdf, data)
         headers = {
             "Content-Disposition": "attachment; filename=contrat_assmat_pro.pdf"
         }
-        return StreamingResponse(buffer, media_type="application/pdf", headers=headers)
+        # A plain Response sends Content-Length, so clients can show progress
+        return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Weekly schedule
 @app.post("/schedule")
-def add_schedule(entry: ScheduleEntry):
+async def add_schedule(entry: ScheduleEntry):
     try:
-        _id = create_document("scheduleentry", entry)
+        _id = await create_document("scheduleentry", entry)
         return {"id": _id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/schedule")
-def get_schedule(user_email: EmailStr):
+async def get_schedule(user_email: EmailStr):
     try:
-        items = get_documents("scheduleentry", {"user_email": str(user_email)}, 200)
-        for it in items:
-            it["_id"] = str(it.get("_id"))
-        return items
+        items = await get_documents("scheduleentry", {"user_email": user_email}, 200, SCHEDULE_PROJECTION)
+        return MongoJSONResponse(items)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Calculators
+def round_cents(amount: float) -> float:
+    """Round money the way every calculator endpoint does, so scalar and batch results agree
+
+    Python's round() works on the exact binary value; np.round rescales first and can land
+    on the other side of a half-cent boundary:
+
+    >>> round_cents(26.5 * 11.33)
+    300.25
+    >>> [round_cents(g) for g in (np.asarray([26.5]) * np.asarray([11.33])).tolist()]
+    [300.25]
+    """
+    return round(amount, 2)
+
 @app.post("/calc/salary")
-def calc_salary(data: SalaryCalc):
+async def calc_salary(data: SalaryCalc):
     gross = data.hours * data.rate
-    return {"gross": round(gross, 2)}
+    return {"gross": round_cents(gross)}
+
+@app.post("/calc/salary/batch")
+async def calc_salary_batch(data: SalaryCalcBatch):
+    gross = [round_cents(g) for g in (np.asarray(data.hours) * np.asarray(data.rate)).tolist()]
+    return {"gross": gross, "total": round_cents(sum(gross))}
 
 @app.post("/calc/leave")
-def calc_leave(data: LeaveCalc):
+async def calc_leave(data: LeaveCalc):
     remaining = data.accrued_days - data.days_taken
     return {"remaining": round(remaining, 2)}
 
 @app.post("/calc/balance")
-def calc_balance(data: BalanceCalc):
+async def calc_balance(data: BalanceCalc):
     balance = data.credits - data.debits
     return {"balance": round(balance, 2)}
 
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 2))
+    # Worker processes inherit this so database.py can split the Mongo pool between them
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    # Multiple workers require the app as an import string; uvicorn's "auto" loop/http
+    # settings already pick uvloop and httptools when they are installed
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers, proxy_headers=True)
@@ -4,17 +4,25 @@ Database Schemas for Assmat Pro
 Each Pydantic model maps to a MongoDB collection using its lowercase class name.
 """
 
-from pydantic import BaseModel, Field, EmailStr
-from typing import Optional, List, Literal
+from pydantic import BaseModel, ConfigDict, Field, EmailStr, StringConstraints, model_validator
+from typing import Annotated, Optional, List, Literal
 from datetime import date
 
 Role = Literal["parent", "assistant"]
 
+# 24h clock time, e.g. "08:30"
+TimeStr = Annotated[str, StringConstraints(pattern=r"^([01]\d|2[0-3]):[0-5]\d$")]
+
+# Shared by every schema: unknown keys are dropped and strings are kept verbatim
+SCHEMA_CONFIG = ConfigDict(extra="ignore", str_strip_whitespace=False, frozen=False)
+
 class User(BaseModel):
     """
     Users collection schema
     Collection: "user"
     """
+    model_config = SCHEMA_CONFIG
+
     name: str = Field(..., description="Full name")
     email: EmailStr = Field(..., description="Email address")
     role: Role = Field(..., description="User role: parent or assistant")
@@ -30,6 +38,8 @@ class Announcement(BaseModel):
     Announcements for matching parents and assistants
     Collection: "announcement"
     """
+    model_config = SCHEMA_CONFIG
+
     title: str = Field(..., description="Title")
     description: str = Field(..., description="Description")
     author_email: EmailStr = Field(..., description="Owner email")
@@ -42,10 +52,12 @@ class Contract(BaseModel):
     Employment contract data
     Collection: "contract"
     """
+    model_config = SCHEMA_CONFIG
+
     parent_email: EmailStr
     assistant_email: EmailStr
     child_name: str
-    start_date: date
+    start_date: date = Field(..., description="Start date (YYYY-MM-DD)", json_schema_extra={"example": "2024-09-02"})
     hours_per_week: float = Field(..., ge=0)
     hourly_rate: float = Field(..., ge=0)
     paid_vacation_days: int = Field(25, ge=0)
@@ -56,21 +68,41 @@ class ScheduleEntry(BaseModel):
     Weekly planning entries
     Collection: "scheduleentry"
     """
+    model_config = SCHEMA_CONFIG
+
     user_email: EmailStr
     weekday: Literal["monday","tuesday","wednesday","thursday","friday","saturday","sunday"]
-    start_time: str = Field(..., description="HH:MM")
-    end_time: str = Field(..., description="HH:MM")
+    start_time: TimeStr = Field(..., description="HH:MM")
+    end_time: TimeStr = Field(..., description="HH:MM")
     note: Optional[str] = None
 
 # Additional simple calculator request models
 class SalaryCalc(BaseModel):
+    model_config = SCHEMA_CONFIG
+
     hours: float
     rate: float
 
+class SalaryCalcBatch(BaseModel):
+    model_config = SCHEMA_CONFIG
+
+    hours: List[float] = Field(..., max_length=10000)
+    rate: List[float] = Field(..., max_length=10000)
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        if len(self.hours) != len(self.rate):
+            raise ValueError("hours and rate must have the same length")
+        return self
+
 class LeaveCalc(BaseModel):
+    model_config = SCHEMA_CONFIG
+
     accrued_days: float
     days_taken: float
 
 class BalanceCalc(BaseModel):
+    model_config = SCHEMA_CONFIG
+
     credits: float
     debits: float